@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Make inference_service importable during collection without every test
+# module prepending to sys.path itself
+sys.path.insert(0, os.path.dirname(__file__))
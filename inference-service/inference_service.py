@@ -1,16 +1,37 @@
 #!/usr/bin/env python3
+"""
+Inference Model Service
 
+Run under a pre-forked Gunicorn server for real request concurrency:
+
+    gunicorn -w 4 -k gthread --threads 8 --keep-alive 30 -b 0.0.0.0:5002 inference_service:application
+"""
+
+import fcntl
 import json
+import mmap
 import os
+import re
+import queue
+import sched
 import subprocess
-import asyncio
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, timedelta
-from flask import Flask, jsonify, request
-import requests
+from functools import partial
+from flask import Flask, Response, request
+import orjson
 import threading
 
+# pystemd lets us query systemd over DBus without forking systemctl; it is
+# optional and we fall back to subprocess when it isn't installed
+try:
+    from pystemd.systemd1 import Manager as SystemdManager
+except ImportError:
+    SystemdManager = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,13 +39,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Decouple log I/O from the threads doing the work: producers only enqueue
+# records, a single listener thread formats and writes them, so a slow or
+# contended stream can't serialize request handlers and monitoring loops
+_log_queue = queue.SimpleQueue()
+_root_logger = logging.getLogger()
+_log_listener = QueueListener(_log_queue, *_root_logger.handlers, respect_handler_level=True)
+_root_logger.handlers = [QueueHandler(_log_queue)]
+_log_listener.start()
+
 app = Flask(__name__)
 
 # Create WSGI application object for production use with Gunicorn
 application = app
 
-# Track server start time
-server_start_time = datetime.now()
+# Response timestamps only carry second resolution, so the formatted string
+# is cached per wall-clock second instead of allocating a datetime plus an
+# isoformat string on every response
+_ts_cache = [0, ""]
+
+def now_iso():
+    """Current wall-clock time as an ISO string, cached per second"""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[:] = [t, datetime.fromtimestamp(t).isoformat()]
+    return _ts_cache[1]
+
+def ojson(obj, status=200):
+    """Serialize a JSON response with orjson; the C encoder is several times
+    faster than jsonify's stdlib json and hands Flask ready-made bytes"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# Track server start time on the monotonic clock; activity ages are float
+# subtractions against time.monotonic(), immune to wall-clock jumps
+SERVER_START_MONO = time.monotonic()
 
 # Directory where model configuration files are stored
 MODELS_DIR = os.environ.get('MODELS_CONFIG_DIR', os.path.expanduser("~/models/configs"))
@@ -52,117 +100,237 @@ def load_config():
 
 config = load_config()
 
+# Thresholds resolved once at import; deep-indexing the config dict and
+# rebuilding a timedelta on every check added up in the monitoring loops
+ACTIVE_THRESHOLD_SEC = config['monitoring']['active_threshold_minutes'] * 60
+IDLE_THRESHOLD_SEC = config['monitoring']['idle_threshold_minutes'] * 60
+IDLE_SHUTDOWN_THRESHOLD_SEC = IDLE_THRESHOLD_SEC * 3
+REPORTING_INTERVAL_SEC = config['monitoring']['reporting_interval_minutes'] * 60
+SHUTDOWN_CHECK_INTERVAL_SEC = config['monitoring']['shutdown_check_interval_minutes'] * 60
+
 # Global variable to track last activity timestamps
 last_activity_timestamps = {}
 
+# Pool and deadlines for systemd calls, so a hung unit can't stall request
+# threads (or starve the Gunicorn workers) indefinitely
+_SYSTEMCTL_POOL = ThreadPoolExecutor(max_workers=4)
+SYSTEMCTL_STATUS_TIMEOUT_SEC = 0.5
+SYSTEMCTL_ACTION_TIMEOUT_SEC = 2
+
+# Last successfully-fetched running set, served when a status query times out
+_last_running_models = []
+
+def get_active_model_units():
+    """
+    Query systemd over DBus for active model@ units in a single round-trip.
+    Returns a set of model names, or None if the DBus path is unavailable.
+    """
+    if SystemdManager is None:
+        return None
+    try:
+        with SystemdManager() as manager:
+            units = manager.Manager.ListUnitsByPatterns([b'active'], [b'model@*.service'])
+        active_names = set()
+        for unit in units:
+            unit_name = unit[0].decode() if isinstance(unit[0], bytes) else unit[0]
+            # Strip the 'model@' prefix and '.service' suffix
+            active_names.add(unit_name[len('model@'):-len('.service')])
+        return active_names
+    except Exception as e:
+        logger.error(f"Error querying systemd over DBus: {e}")
+        return None
+
+def _query_running_models():
+    """Ask systemd for all active model@ units in one query"""
+    # Prefer the in-process DBus query; one round-trip, no fork/exec
+    active_units = get_active_model_units()
+    if active_units is not None:
+        return sorted(active_units)
+
+    # One systemctl invocation regardless of model count
+    result = subprocess.run(
+        ['systemctl', 'list-units', '--type=service', '--state=active',
+         '--no-legend', '--plain', 'model@*.service'],
+        capture_output=True
+    )
+
+    running_models = []
+    for line in result.stdout.splitlines():
+        if not line.strip():
+            continue
+        unit_name = line.split(None, 1)[0].decode()
+        if unit_name.startswith('model@') and unit_name.endswith('.service'):
+            running_models.append(unit_name[len('model@'):-len('.service')])
+    return running_models
+
 def get_running_models():
-    """Get list of currently running inference models by checking systemd service status"""
+    """Get list of currently running inference models by asking systemd once
+    for all active model@ units, instead of enumerating configs and checking
+    each one. The query runs under a short deadline; on timeout the last
+    known set is returned so a stuck systemd can't stall request threads."""
+    global _last_running_models
     try:
-        running_models = []
-        # Get available models to know what models we should check
-        available_models = get_available_models()
-        
-        # Extract model names from available models
-        model_names = [model['model_name'] for model in available_models]
-        
-        # Check each model's systemd service status
-        for model_name in model_names:
-            try:
-                # Execute systemctl status command to check if the service is running
-                result = subprocess.run(
-                    ['systemctl', 'is-active', f'model@{model_name}'],
-                    capture_output=True,
-                    text=True
-                )
-                
-                # If the service is active, add it to running models
-                if result.returncode == 0 and result.stdout.strip() == 'active':
-                    running_models.append(model_name)
-            except Exception as e:
-                # If there's an error checking a specific model, continue with others
-                logger.error(f"Error checking status for model {model_name}: {e}")
-                continue
-        
-        return running_models
+        _last_running_models = _SYSTEMCTL_POOL.submit(_query_running_models).result(
+            timeout=SYSTEMCTL_STATUS_TIMEOUT_SEC
+        )
+        return _last_running_models
+    except FutureTimeoutError:
+        logger.warning("systemd status query timed out, serving last known running set")
+        return _last_running_models
     except Exception as e:
         logger.error(f"Error getting running models: {e}")
         return []
 
+# Cache of parsed model configs keyed on the directory mtime, so repeated
+# requests against a stable config dir don't rescan and reopen every file;
+# 'names' is the matching set of model names, used as an action whitelist.
+# Within MODELS_CACHE_TTL_SEC of the last validation ('ts') the cache is
+# served without even the directory stat; the lock keeps concurrent callers
+# from racing to rescan on expiry
+_models_cache = {'mtime': -1, 'data': [], 'names': None, 'ts': 0.0}
+_models_lock = threading.Lock()
+MODELS_CACHE_TTL_SEC = config['monitoring'].get('models_cache_ttl_sec', 30)
+
+# Per-file PORT cache keyed on (mtime_ns, size); when the directory changes
+# but individual config files didn't, their parse is skipped too
+_port_cache = {}
+
+# Matches a PORT= line like PORT="8198" at the start of a line; compiled once
+# and searched over the whole (mmap'd) file in a single pass
+_PORT_RE = re.compile(rb'^PORT=["\']?(\d+)', re.M)
+
+# Fallback model-name validation when the whitelist cache is cold: one safe
+# character class, bounded so oversized names never reach systemd
+_MODEL_NAME_RE = re.compile(r'\A[A-Za-z0-9_.-]{1,64}\Z')
+
 def get_available_models():
     """
     Get list of available models from the configs directory.
     Reads configuration files from a specified directory, parses each file to extract
     the PORT value, and returns a list containing all discovered port numbers along
     with their corresponding model names and file paths.
+    Results are cached until the directory mtime changes; within the TTL of
+    the last validation not even the stat is repeated.
     """
     if not os.path.exists(MODELS_DIR):
         return []
-    
-    # Get all files in the models directory (these represent model names)
+
+    # Inside the TTL window the cached listing is served as-is
+    now = time.monotonic()
+    if _models_cache['ts'] and now - _models_cache['ts'] < MODELS_CACHE_TTL_SEC:
+        return _models_cache['data']
+
+    # Serve from cache while the directory is unchanged
     try:
-        files = os.listdir(MODELS_DIR)
-        # Filter out directories, keep only files
-        model_configs = []
-        
-        for file in files:
-            file_path = os.path.join(MODELS_DIR, file)
-            if os.path.isfile(file_path):
-                # Parse the configuration file to extract PORT value
-                port = None
-                try:
-                    with open(file_path, 'r') as f:
-                        for line in f:
-                            if line.startswith('PORT='):
-                                # Extract port value from line like PORT="8198"
-                                port = line.split('=')[1].strip().strip('"')
-                                break
-                except Exception as e:
-                    logger.error(f"Error reading config file {file}: {e}")
-                
-                model_configs.append({
-                    "model_name": file,
-                    "file_path": file_path,
-                    "port": port
-                })
-        
-        return model_configs
-    except Exception as e:
-        logger.error(f"Error reading models directory: {e}")
-        return []
+        dir_mtime = os.stat(MODELS_DIR).st_mtime_ns
+    except OSError:
+        dir_mtime = None
+    if dir_mtime is not None and dir_mtime == _models_cache['mtime']:
+        _models_cache['ts'] = now
+        return _models_cache['data']
+
+    # Expired or changed: rescan under a lock so concurrent callers on a
+    # cold cache don't race to re-parse the same files
+    with _models_lock:
+        # Another thread may have refreshed while we waited
+        if _models_cache['ts'] and time.monotonic() - _models_cache['ts'] < MODELS_CACHE_TTL_SEC:
+            return _models_cache['data']
+
+        # Get all files in the models directory (these represent model names);
+        # scandir surfaces the file type from a single getdents64 instead of an
+        # extra stat() per entry like listdir+isfile
+        try:
+            model_configs = []
+
+            with os.scandir(MODELS_DIR) as entries:
+                for entry in entries:
+                    # Skip directories, keep only files
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    file = entry.name
+                    file_path = entry.path
+
+                    # Reuse the parsed PORT when the file itself is unchanged
+                    try:
+                        file_stat = entry.stat(follow_symlinks=False)
+                        file_key = (file_stat.st_mtime_ns, file_stat.st_size)
+                    except OSError:
+                        file_key = None
+                    if file_key is not None and _port_cache.get(file_path, (None, None))[0] == file_key:
+                        model_configs.append({
+                            "model_name": file,
+                            "file_path": file_path,
+                            "port": _port_cache[file_path][1]
+                        })
+                        continue
+
+                    # Parse the configuration file to extract PORT value; mmap +
+                    # find gives one libc-speed scan instead of a Python line loop
+                    port = None
+                    try:
+                        with open(file_path, 'rb') as f:
+                            try:
+                                data = mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ)
+                            except (OSError, ValueError):
+                                # Empty or unmappable file; fall back to a plain read
+                                data = f.read()
+                            # Extract port value from a line like PORT="8198"
+                            match = _PORT_RE.search(data)
+                            if match:
+                                port = match.group(1).decode()
+                    except Exception as e:
+                        logger.error(f"Error reading config file {file}: {e}")
+
+                    if file_key is not None:
+                        _port_cache[file_path] = (file_key, port)
+                    model_configs.append({
+                        "model_name": file,
+                        "file_path": file_path,
+                        "port": port
+                    })
+
+            if dir_mtime is not None:
+                _models_cache['mtime'] = dir_mtime
+                _models_cache['data'] = model_configs
+                _models_cache['names'] = {m['model_name'] for m in model_configs}
+                _models_cache['ts'] = time.monotonic()
+            return model_configs
+        except Exception as e:
+            logger.error(f"Error reading models directory: {e}")
+            return []
+
+# Short-lived combined snapshot of available and running models; consumers
+# that need both inside one request or tick share a single pair of queries
+_state_cache = {'ts': 0.0, 'available': [], 'running': []}
+STATE_SNAPSHOT_TTL_SEC = 5.0
+
+def get_state_snapshot(ttl=STATE_SNAPSHOT_TTL_SEC):
+    """Get a dict with 'available' and 'running' model lists, refreshed at
+    most once per ttl seconds"""
+    now = time.monotonic()
+    if now - _state_cache['ts'] >= ttl:
+        _state_cache['available'] = get_available_models()
+        _state_cache['running'] = get_running_models()
+        _state_cache['ts'] = now
+    return _state_cache
 
 def update_last_activity(model_name):
     """Update the last activity timestamp for a model"""
-    last_activity_timestamps[model_name] = datetime.now()
-
-def get_last_activity(model_name):
-    """Get the last activity timestamp for a model, return server start time if none recorded"""
-    activity = last_activity_timestamps.get(model_name, None)
-    if activity is None:
-        return server_start_time
-    return activity
-
-def is_model_active(model_name):
-    """Check if a model has been active within the last X minutes"""
-    last_activity = get_last_activity(model_name)
-    if not last_activity:
-        return False
-    
-    threshold = timedelta(minutes=config['monitoring']['active_threshold_minutes'])
-    return datetime.now() - last_activity <= threshold
-
-def is_model_idle(model_name):
-    """Check if a model has been idle for more than the threshold"""
-    last_activity = get_last_activity(model_name)
-    if not last_activity:
-        # If no activity recorded, consider it idle
-        return True
-    
-    threshold = timedelta(minutes=config['monitoring']['idle_threshold_minutes'])
-    return datetime.now() - last_activity > threshold
+    last_activity_timestamps[model_name] = time.monotonic()
 
 def shutdown_model(model_name):
     """Shutdown a model using systemctl directly"""
     try:
+        # Prefer the in-process DBus stop; no fork, no sudo PAM setup
+        if SystemdManager is not None:
+            try:
+                with SystemdManager() as manager:
+                    manager.Manager.StopUnit(f'model@{model_name}.service'.encode(), b'replace')
+                logger.info(f"Successfully stopped model: {model_name}")
+                return True
+            except Exception as e:
+                logger.error(f"DBus stop failed for model {model_name}, falling back to systemctl: {e}")
+
         # Use systemctl to stop the model service directly
         result = subprocess.run(
             ['sudo', 'systemctl', 'stop', f'model@{model_name}'],
@@ -203,92 +371,88 @@ def execute_shutdown():
 def check_and_shutdown_idle_models():
     """Periodically check for idle models and shut them down"""
     logger.info("Checking for idle models...")
-    
-    # Get all available models
-    available_models = get_available_models()
-    
-    # Get currently running models
+
+    # Ask systemd first; on the quiescent path there is nothing to stop and
+    # no reason to rescan the config directory at all
     running_models = get_running_models()
-    
-    # Extract model names from the available models data structure
-    available_model_names = [model['model_name'] for model in available_models]
-    
-    # Check if all running models are idle for more than the threshold
-    all_models_idle = True
-    latest_activity = None
-    idle_threshold = timedelta(minutes=config['monitoring']['idle_threshold_minutes']*3)
-    
-    for model_name in available_model_names:
-        if not is_model_idle(model_name):
-            all_models_idle = False
-            break
-        else:
-            # Track the latest activity timestamp among idle models
-            last_activity = get_last_activity(model_name)
-            if last_activity:
-                if latest_activity is None or last_activity > latest_activity:
-                    latest_activity = last_activity
-    
-    # If all models are idle for more than the threshold, shutdown the system
-    if all_models_idle and latest_activity:
-        # Check if all models have been idle for longer than the threshold
-        logger.info(f"Idle threashold: {str(idle_threshold)}")
-        if datetime.now() - latest_activity > idle_threshold:
-            logger.info("All models have been idle for more than the threshold, shutting down system...")
+
+    now = time.monotonic()
+    if not running_models:
+        # Nothing running: idleness of defined-but-stopped models is
+        # vacuously true, so the only question is whether the newest
+        # recorded activity has aged past the shutdown window
+        latest_activity = max(last_activity_timestamps.values(), default=SERVER_START_MONO)
+        if now - latest_activity > IDLE_SHUTDOWN_THRESHOLD_SEC:
+            logger.info("No models running and no recent activity, shutting down system...")
             execute_shutdown()
-            return
-    
-    # Check each model that's running but not active
+        return
+
+    # Get all available models
+    available_models = get_available_models()
+
+    # Extract model names as a set; the loop below does membership tests
+    available_model_names = {model['model_name'] for model in available_models}
+
+    # Snapshot the activity dict once; request threads mutate it concurrently
+    activity_snapshot = last_activity_timestamps.copy()
+
+    # Collect the running models that have gone idle; once the last one is
+    # down, the next pass takes the empty-running branch above and can power
+    # off
+    idle_models = []
     for model_name in running_models:
         # Only process models that are in our available models list
         if model_name in available_model_names:
-            if is_model_idle(model_name):
+            if now - activity_snapshot.get(model_name, SERVER_START_MONO) > IDLE_THRESHOLD_SEC:
                 logger.info(f"Model {model_name} has been idle for too long, shutting down...")
-                shutdown_model(model_name)
+                idle_models.append(model_name)
             else:
                 logger.info(f"Model {model_name} is still active")
 
-async def reporting_task():
-    """Async task to periodically report model activity"""
-    while True:
-        try:
-            # Get all available models
-            available_models = get_available_models()
-            
-            # Get currently running models
-            running_models = get_running_models()
-            
-            # Extract model names from the available models data structure
-            available_model_names = [model['model_name'] for model in available_models]
-            
-            # Check which models are active (recently used)
-            active_models = []
-            for model in available_models:
-                model_name = model['model_name']
-                if is_model_active(model_name):
-                    active_models.append(model_name)
-            
-            logger.info(f"Reporting: Available models: {available_model_names}")
-            logger.info(f"Reporting: Running models: {running_models}")
-            logger.info(f"Reporting: Active models (last 10 minutes): {active_models}")
-            
-            # Wait for the reporting interval
-            await asyncio.sleep(config['monitoring']['reporting_interval_minutes'] * 60)
-        except Exception as e:
-            logger.error(f"Error in reporting task: {e}")
-            await asyncio.sleep(60)  # Wait a minute before retrying
+    # Fan the stops out across the systemd pool so several shutdowns overlap
+    # instead of paying each round-trip serially
+    if idle_models:
+        list(_SYSTEMCTL_POOL.map(shutdown_model, idle_models))
 
-async def shutdown_check_task():
-    """Async task to periodically check for and shutdown idle models"""
-    while True:
-        try:
-            check_and_shutdown_idle_models()
-            
-            # Wait for the shutdown check interval
-            await asyncio.sleep(config['monitoring']['shutdown_check_interval_minutes'] * 60)
-        except Exception as e:
-            logger.error(f"Error in shutdown check task: {e}")
-            await asyncio.sleep(60)  # Wait a minute before retrying
+def reporting_pass():
+    """Log one report of available, running and recently-active models"""
+    # One shared snapshot covers both queries for this tick
+    snapshot = get_state_snapshot()
+    available_models = snapshot['available']
+    running_models = snapshot['running']
+
+    # Extract model names from the available models data structure
+    available_model_names = [model['model_name'] for model in available_models]
+
+    # Check which models are active (recently used), against one
+    # snapshot of the concurrently-updated activity dict
+    activity_snapshot = last_activity_timestamps.copy()
+    now = time.monotonic()
+    active_models = []
+    for model in available_models:
+        model_name = model['model_name']
+        if now - activity_snapshot.get(model_name, SERVER_START_MONO) <= ACTIVE_THRESHOLD_SEC:
+            active_models.append(model_name)
+
+    logger.info(f"Reporting: Available models: {available_model_names}")
+    logger.info(f"Reporting: Running models: {running_models}")
+    logger.info(f"Reporting: Active models (last 10 minutes): {active_models}")
+
+# One scheduler thread dispatches both periodic jobs instead of a dedicated
+# sleep-loop thread per job; when the intervals align the jobs run
+# back-to-back and share one state snapshot
+_scheduler = sched.scheduler(time.monotonic, time.sleep)
+
+def _run_periodic(fn, interval):
+    """Run one pass of a scheduled job and requeue it; failed passes retry
+    after a minute"""
+    delay = interval
+    try:
+        fn()
+    except Exception as e:
+        logger.error(f"Error in scheduled task {fn.__name__}: {e}")
+        delay = 60
+    _scheduler.enter(delay, 1, _run_periodic, (fn, interval))
 
 def systemctl_action(action, model_name):
     """Execute systemctl action on a model"""
@@ -298,22 +462,43 @@ def systemctl_action(action, model_name):
         if action not in valid_actions:
             return False, f"Invalid action. Must be one of: {valid_actions}"
         
-        # Validate model name (ensure it's a valid filename)
-        if not model_name or '/' in model_name or '..' in model_name:
+        # Validate model name against the cached whitelist of discovered
+        # models; before the first successful directory scan fall back to a
+        # strict character-class check
+        known_names = _models_cache['names']
+        if known_names is not None:
+            if model_name not in known_names:
+                return False, f"Unknown model: {model_name}"
+        elif not _MODEL_NAME_RE.match(model_name):
             return False, "Invalid model name"
-        
-        # Execute systemctl command
-        result = subprocess.run(
+
+        # Prefer the DBus path: one round-trip on an already-open socket
+        # instead of a sudo systemctl fork per request (authorize the service
+        # user via a polkit rule rather than sudoers)
+        if SystemdManager is not None:
+            try:
+                with SystemdManager() as manager:
+                    method = getattr(manager.Manager, f'{action.capitalize()}Unit')
+                    method(f'model@{model_name}.service'.encode(), b'replace')
+                return True, f"Successfully {action}ed model {model_name}"
+            except Exception as e:
+                logger.error(f"DBus {action} failed for model {model_name}, falling back to systemctl: {e}")
+
+        # Execute systemctl command under a bounded deadline
+        result = _SYSTEMCTL_POOL.submit(
+            subprocess.run,
             ['sudo', 'systemctl', action, f'model@{model_name}'],
             capture_output=True,
             text=True
-        )
-        
+        ).result(timeout=SYSTEMCTL_ACTION_TIMEOUT_SEC)
+
         if result.returncode == 0:
             return True, f"Successfully {action}ed model {model_name}"
         else:
             return False, f"Failed to {action} model {model_name}: {result.stderr.strip()}"
-            
+
+    except FutureTimeoutError:
+        return False, f"Timed out trying to {action} model {model_name}"
     except Exception as e:
         return False, f"Error executing systemctl command: {str(e)}"
 
@@ -322,187 +507,193 @@ def get_available_models_endpoint():
     """Get list of available inference models with their port information"""
     try:
         models = get_available_models()
-        return jsonify({
+        return ojson({
             "status": "success",
             "models": models
-        }), 200
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
 @app.route('/models/running', methods=['GET'])
 def get_running_models_endpoint():
     """Get list of currently running inference models"""
     try:
-        running_models = get_running_models()
-        return jsonify({
+        running_models = get_state_snapshot()['running']
+        return ojson({
             "status": "success",
             "running_models": running_models
-        }), 200
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
-@app.route('/models/<model_name>/start', methods=['POST'])
-def start_model(model_name):
-    """Start an inference model"""
+def model_action(action, model_name):
+    """Run a systemctl action on a model; shared by start/stop/restart"""
     try:
-        success, message = systemctl_action('start', model_name)
-        
-        if success:
-            return jsonify({
-                "status": "success",
-                "message": message
-            }), 200
-        else:
-            return jsonify({
-                "status": "error",
-                "message": message
-            }), 400
-            
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+        success, message = systemctl_action(action, model_name)
 
-@app.route('/models/<model_name>/stop', methods=['POST'])
-def stop_model(model_name):
-    """Stop an inference model"""
-    try:
-        success, message = systemctl_action('stop', model_name)
-        
-        if success:
-            return jsonify({
-                "status": "success",
-                "message": message
-            }), 200
-        else:
-            return jsonify({
-                "status": "error",
-                "message": message
-            }), 400
-            
+        return ojson({
+            "status": "success" if success else "error",
+            "message": message
+        }, 200 if success else 400)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
-
-@app.route('/models/<model_name>/restart', methods=['POST'])
-def restart_model(model_name):
-    """Restart an inference model"""
+        }, 500)
+
+# The start/stop/restart views were copy-paste of one template; register the
+# three URL rules against the shared handler instead
+for _action in ('start', 'stop', 'restart'):
+    app.add_url_rule(
+        f'/models/<model_name>/{_action}',
+        endpoint=f'{_action}_model',
+        view_func=partial(model_action, _action),
+        methods=['POST']
+    )
+
+@app.route('/models/<model_name>/ensure_running', methods=['POST'])
+def ensure_model_running(model_name):
+    """Start a model if needed and return once it is actually running.
+
+    Lets callers replace a check/start/poll sequence with one exchange;
+    already-running models return immediately.
+    """
     try:
-        success, message = systemctl_action('restart', model_name)
-        
-        if success:
-            return jsonify({
+        timeout = request.args.get('timeout', 60, type=int)
+
+        if model_name in get_running_models():
+            return ojson({
                 "status": "success",
-                "message": message
-            }), 200
-        else:
-            return jsonify({
+                "message": f"Model {model_name} is running"
+            }, 200)
+
+        success, message = systemctl_action('start', model_name)
+        if not success:
+            return ojson({
                 "status": "error",
                 "message": message
-            }), 400
-            
+            }, 400)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if model_name in get_running_models():
+                return ojson({
+                    "status": "success",
+                    "message": f"Model {model_name} is running"
+                }, 200)
+            time.sleep(1)
+
+        return ojson({
+            "status": "error",
+            "message": f"Timed out waiting for model {model_name} to start"
+        }, 504)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
 @app.route('/models/active', methods=['GET'])
 def get_active_models():
     """Get list of models that have been active in the last 10 minutes"""
     try:
         available_models = get_available_models()
-        
-        # Extract model names from the available models data structure
-        available_model_names = [model['model_name'] for model in available_models]
-        
-        active_models = []
-        for model in available_models:
-            model_name = model['model_name']
-            if is_model_active(model_name):
-                active_models.append(model_name)
-        
-        return jsonify({
+
+        # One snapshot and one age comparison per model, instead of a helper
+        # call that re-reads both the clock and the dict each time
+        activity_snapshot = last_activity_timestamps.copy()
+        now = time.monotonic()
+        active_models = [
+            model['model_name'] for model in available_models
+            if now - activity_snapshot.get(model['model_name'], SERVER_START_MONO) <= ACTIVE_THRESHOLD_SEC
+        ]
+
+        return ojson({
             "status": "success",
             "active_models": active_models,
-            "timestamp": datetime.now().isoformat()
-        }), 200
+            "timestamp": now_iso()
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
 @app.route('/models/idle', methods=['GET'])
 def get_idle_models():
     """Get list of models that have been idle for more than 30 minutes"""
     try:
-        available_models = get_available_models()
-        running_models = get_running_models()
-        
-        # Extract model names from the available models data structure
-        available_model_names = [model['model_name'] for model in available_models]
-        
-        idle_models = []
-        for model_name in running_models:
-            # Only process models that are in our available models list
-            if model_name in available_model_names:
-                if is_model_idle(model_name):
-                    idle_models.append(model_name)
-        
-        return jsonify({
+        snapshot = get_state_snapshot()
+        available_models = snapshot['available']
+        running_models = snapshot['running']
+
+        # Extract model names as a set for O(1) membership tests below
+        available_model_names = {model['model_name'] for model in available_models}
+
+        # Classify each running model from one snapshot read
+        activity_snapshot = last_activity_timestamps.copy()
+        now = time.monotonic()
+        idle_models = [
+            model_name for model_name in running_models
+            if model_name in available_model_names
+            and now - activity_snapshot.get(model_name, SERVER_START_MONO) > IDLE_THRESHOLD_SEC
+        ]
+
+        return ojson({
             "status": "success",
             "idle_models": idle_models,
-            "timestamp": datetime.now().isoformat()
-        }), 200
+            "timestamp": now_iso()
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
 @app.route('/models/activity', methods=['GET'])
 def get_model_activity():
     """Get activity status for all models"""
     try:
         available_models = get_available_models()
-        running_models = get_running_models()
-        
-        # Extract model names from the available models data structure
-        available_model_names = [model['model_name'] for model in available_models]
-        
-        activity_status = {}
+
+        # One snapshot, one pass: each model costs a single dict lookup and
+        # one age computation instead of three helper calls redoing both.
+        # Timestamps are monotonic floats internally; convert to wall-clock
+        # only here at the presentation boundary
+        activity_snapshot = last_activity_timestamps.copy()
+        now_mono = time.monotonic()
+        wall_now = datetime.now()
+
+        # Pre-size the result dict from the known model count so the hash
+        # table never rehashes while it fills
+        activity_status = dict.fromkeys(model['model_name'] for model in available_models)
         for model in available_models:
             model_name = model['model_name']
-            last_activity = get_last_activity(model_name)
-            is_active = is_model_active(model_name)
-            is_idle = is_model_idle(model_name)
-            
+            age = now_mono - activity_snapshot.get(model_name, SERVER_START_MONO)
+
+            last_seen = wall_now - timedelta(seconds=age)
             activity_status[model_name] = {
-                "last_activity": last_activity.isoformat() if last_activity else None,
-                "is_active": is_active,
-                "is_idle": is_idle
+                "last_activity": last_seen.isoformat(),
+                "is_active": age <= ACTIVE_THRESHOLD_SEC,
+                "is_idle": age > IDLE_THRESHOLD_SEC
             }
-        
-        return jsonify({
+
+        return ojson({
             "status": "success",
             "activity_status": activity_status,
-            "timestamp": datetime.now().isoformat()
-        }), 200
+            "timestamp": now_iso()
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
 @app.route('/models/<model_name>/report', methods=['POST'])
 def report_model_activity(model_name):
@@ -510,39 +701,50 @@ def report_model_activity(model_name):
     try:
         update_last_activity(model_name)
         
-        return jsonify({
+        return ojson({
             "status": "success",
             "message": f"Activity reported for model {model_name}",
-            "timestamp": datetime.now().isoformat()
-        }), 200
+            "timestamp": now_iso()
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "error",
             "message": str(e)
-        }), 500
+        }, 500)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint.
+
+    Liveness probes only need to know the process answers; scanning the
+    config directory on every probe just adds disk load and lets disk
+    pressure flap the probe. Pass ?deep=1 to also exercise the model scan.
+    """
+    if not request.args.get('deep'):
+        return ojson({
+            "status": "healthy",
+            "service": "Inference Model Service"
+        }, 200)
+
     try:
-        response = get_available_models()
-        
-        return jsonify({
+        get_available_models()
+
+        return ojson({
             "status": "healthy",
             "service": "Inference Model Service",
-            "timestamp": datetime.now().isoformat()
-        }), 200
+            "timestamp": now_iso()
+        }, 200)
     except Exception as e:
-        return jsonify({
+        return ojson({
             "status": "unhealthy",
             "message": str(e),
-            "timestamp": datetime.now().isoformat()
-        }), 500
+            "timestamp": now_iso()
+        }, 500)
 
 @app.route('/', methods=['GET'])
 def home():
     """Home endpoint with API information"""
-    return jsonify({
+    return ojson({
         "service": "Inference Model Service",
         "endpoints": {
             "GET /models": "Get list of available models",
@@ -560,44 +762,54 @@ def home():
     })
 
 
-# Global variable to track if async tasks are running
-async_tasks_running = False
+# Global variable to track if the monitoring threads are running
+monitoring_threads_running = False
+
+# flock target electing one process to run the monitoring loops; the fd is
+# held for the life of the winner and the kernel releases it on exit
+_MONITOR_LOCK_PATH = '/tmp/inference-service-monitor.lock'
+_monitor_lock_fd = None
+
+def _acquire_monitor_lock():
+    """Try to take the cross-process monitoring lock; True if we won"""
+    global _monitor_lock_fd
+    try:
+        fd = os.open(_MONITOR_LOCK_PATH, os.O_CREAT | os.O_RDWR, 0o644)
+    except OSError as e:
+        # No usable lock file; better duplicated loops than none at all
+        logger.warning(f"Could not open monitor lock file: {e}")
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    _monitor_lock_fd = fd
+    return True
+
+def start_monitoring_threads():
+    """Start the periodic monitoring jobs on one scheduler daemon thread.
+
+    The jobs are plain blocking code (subprocess, DBus, logging), so a
+    single thread draining a sched queue covers both; the old per-process
+    event loop and per-job threads only added overhead around the same
+    blocking calls.
+    """
+    global monitoring_threads_running
+    if monitoring_threads_running:
+        return
 
-def start_async_tasks():
-    """Start the async monitoring tasks in a separate thread"""
-    global async_tasks_running
-    if async_tasks_running:
+    # Under a pre-forked server every worker imports this module; the flock
+    # elects exactly one process to run the loops so N workers don't each
+    # poll systemd on their own schedule
+    if not _acquire_monitor_lock():
+        logger.info("Monitoring loops already owned by another worker, skipping")
         return
-    
-    # Create a new event loop for the async tasks
-    async_loop = asyncio.new_event_loop()
-    
-    def run_async_tasks():
-        """Run the async monitoring tasks in a separate thread"""
-        asyncio.set_event_loop(async_loop)
-        try:
-            # Create tasks for reporting and shutdown checking
-            reporting_task_future = async_loop.create_task(reporting_task())
-            shutdown_task_future = async_loop.create_task(shutdown_check_task())
-            
-            # Run the tasks indefinitely
-            async_loop.run_forever()
-        except KeyboardInterrupt:
-            logger.info("Shutting down async tasks...")
-            reporting_task_future.cancel()
-            shutdown_task_future.cancel()
-            async_loop.run_until_complete(asyncio.gather(reporting_task_future, shutdown_task_future, return_exceptions=True))
-            async_loop.close()
-    
-    # Start async tasks in a separate thread
-    async_thread = threading.Thread(target=run_async_tasks, daemon=True)
-    async_thread.start()
-    async_tasks_running = True
-
-# Start async tasks when the module is imported (for Gunicorn) but only once
-start_async_tasks()
-
-# Only run the app directly if this is the main module (not when run via gunicorn)
-if __name__ == '__main__':
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=config['service']['port'], debug=True)
\ No newline at end of file
+
+    _scheduler.enter(0, 1, _run_periodic, (reporting_pass, REPORTING_INTERVAL_SEC))
+    _scheduler.enter(0, 2, _run_periodic, (check_and_shutdown_idle_models, SHUTDOWN_CHECK_INTERVAL_SEC))
+    threading.Thread(target=_scheduler.run, daemon=True).start()
+    monitoring_threads_running = True
+
+# Start monitoring threads when the module is imported (for Gunicorn) but only once
+start_monitoring_threads()
\ No newline at end of file
@@ -2,26 +2,57 @@
 
 import unittest
 from unittest.mock import patch, MagicMock
-import sys
 import os
 
-# Add the inference service directory to path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+# sys.path is prepared once in conftest.py
+import inference_service
+from inference_service import app, get_available_models, get_running_models, systemctl_action
 
-from inference_service import get_available_models, get_running_models, systemctl_action
+def fake_scandir(file_names):
+    """Build a mock os.scandir() context manager yielding file entries"""
+    entries = []
+    for name in file_names:
+        entry = MagicMock()
+        entry.name = name
+        entry.path = os.path.join('/fake/models', name)
+        entry.is_file.return_value = True
+        # Force the parse path rather than the per-file cache
+        entry.stat.side_effect = OSError
+        entries.append(entry)
+    scandir_cm = MagicMock()
+    # Fresh iterator per use; the background monitoring thread may also scan
+    # while the patch is active
+    scandir_cm.__enter__.side_effect = lambda: iter(entries)
+    scandir_cm.__exit__.return_value = False
+    return scandir_cm
 
 class TestInferenceService(unittest.TestCase):
+
+    def setUp(self):
+        """Reset the module-level caches so no test sees state cached by
+        another test or scanned from the host filesystem"""
+        inference_service._models_cache.update(
+            {'mtime': -1, 'data': [], 'names': None, 'ts': 0.0})
+        inference_service._port_cache.clear()
+
+    def test_models_route_not_shadowed(self):
+        """The /models view must not share a name with get_available_models,
+        otherwise the handler recurses into itself instead of scanning the dir"""
+        view = app.view_functions['get_available_models_endpoint']
+        self.assertIsNot(view, get_available_models)
     
     @patch('inference_service.os.path.exists')
-    @patch('inference_service.os.listdir')
-    @patch('inference_service.os.path.isfile')
-    @patch('builtins.open', new_callable=unittest.mock.mock_open, read_data='PORT="8198"')
-    def test_get_available_models(self, mock_open, mock_isfile, mock_listdir, mock_exists):
+    @patch('inference_service.os.scandir')
+    # Make the directory stat fail so the mocked listing is never cached,
+    # regardless of whether MODELS_DIR exists on the host running the tests
+    @patch('inference_service.os.stat', side_effect=OSError)
+    @patch('inference_service.mmap.mmap', side_effect=ValueError)
+    @patch('builtins.open', new_callable=unittest.mock.mock_open, read_data=b'PORT="8198"\n')
+    def test_get_available_models(self, mock_open, mock_mmap, mock_stat, mock_scandir, mock_exists):
         """Test getting available models with port information"""
         mock_exists.return_value = True
-        mock_listdir.return_value = ['model1.conf', 'model2.conf']
-        mock_isfile.return_value = True
-        
+        mock_scandir.return_value = fake_scandir(['model1.conf', 'model2.conf'])
+
         models = get_available_models()
         self.assertEqual(len(models), 2)
         self.assertEqual(models[0]['model_name'], 'model1.conf')
@@ -29,12 +60,13 @@ class TestInferenceService(unittest.TestCase):
         self.assertIn('model1.conf', models[0]['file_path'])
     
     @patch('inference_service.os.path.exists')
-    @patch('inference_service.os.listdir')
-    def test_get_available_models_empty(self, mock_listdir, mock_exists):
+    @patch('inference_service.os.scandir')
+    @patch('inference_service.os.stat', side_effect=OSError)
+    def test_get_available_models_empty(self, mock_stat, mock_scandir, mock_exists):
         """Test getting available models when directory is empty"""
         mock_exists.return_value = True
-        mock_listdir.return_value = []
-        
+        mock_scandir.return_value = fake_scandir([])
+
         models = get_available_models()
         self.assertEqual(models, [])
     
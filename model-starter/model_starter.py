@@ -4,11 +4,21 @@
 import asyncio
 import aiohttp
 import logging
+import queue
 from aiohttp import web
+from logging.handlers import QueueHandler, QueueListener
 import sys
 import os
 from typing import Optional
 
+# uvloop is a drop-in libuv event loop that roughly doubles throughput for
+# a purely network-bound server like this one; fall back to the stdlib
+# selector loop when it isn't installed
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +28,16 @@ logging.basicConfig(
         logging.StreamHandler(sys.stdout)
     ]
 )
+
+# Log writes must never run on the event loop thread: route records through
+# a queue to a listener thread that owns the file/stream handlers, so a
+# handler inside a request coroutine is just a put_nowait
+_log_queue = queue.SimpleQueue()
+_root_logger = logging.getLogger()
+_log_listener = QueueListener(_log_queue, *_root_logger.handlers, respect_handler_level=True)
+_root_logger.handlers = [QueueHandler(_log_queue)]
+_log_listener.start()
+
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -25,58 +45,165 @@ INFERENCE_SERVER_HOST = os.getenv('INFERENCE_SERVER_HOST', 'localhost')
 INFERENCE_SERVER_PORT = os.getenv('INFERENCE_SERVER_PORT', '5002')
 INFERENCE_SERVER_URL = f"http://{INFERENCE_SERVER_HOST}:{INFERENCE_SERVER_PORT}"
 
+# Safety-net poll interval while waiting on the readiness callback
+READY_POLL_INTERVAL = 10
+
 class ModelStarter:
     def __init__(self):
         self.app = web.Application()
+        # One shared session for every upstream call; a fresh session per
+        # poll meant a TCP handshake per poll
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Per-model readiness events set by the /internal/ready callback so
+        # waiters resume the moment a model is up instead of on the next poll
+        self._ready_events = {}
+        # Single-flight state: one in-progress start per model, so nginx
+        # retry storms don't trigger duplicate starts
+        self._starting = {}
+        self._start_lock = asyncio.Lock()
         self.setup_routes()
-        
+        self.app.on_startup.append(self._init_session)
+        self.app.on_cleanup.append(self._close_session)
+
     def setup_routes(self):
+        # Readiness callback from the inference service, registered first so
+        # the catch-all model route doesn't shadow it
+        self.app.router.add_route('POST', '/internal/ready/{model_name}', self.handle_ready_notification)
         # Register all HTTP methods for the model endpoint
         self.app.router.add_route('*', '/{model_name}/', self.handle_model_request)
         self.app.router.add_route('*', '/{model_name}/{path:.*}', self.handle_model_request)
-        
+
+    async def handle_ready_notification(self, request: web.Request) -> web.Response:
+        """Mark a model ready; wakes any request waiting in wait_for_model_ready"""
+        model_name = request.match_info.get('model_name', '')
+        event = self._ready_events.get(model_name)
+        if event is not None:
+            event.set()
+        return web.Response(status=204)
+
+    async def _init_session(self, app):
+        """Create the shared keep-alive session once the loop is running"""
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=20,
+                                           keepalive_timeout=60, enable_cleanup_closed=True),
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+
+        # Prewarm a handful of keep-alive connections so the first burst of
+        # traffic doesn't pay TCP handshakes while the pool ramps up
+        async def probe():
+            try:
+                async with self._session.get(f"{INFERENCE_SERVER_URL}/health") as response:
+                    await response.read()
+            except Exception:
+                pass
+
+        await asyncio.gather(*[probe() for _ in range(8)])
+
+    async def _close_session(self, app):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Shared session; created lazily when methods are called outside
+        the app lifecycle (e.g. from tests)"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=20,
+                                               keepalive_timeout=60, enable_cleanup_closed=True),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._session
+
     async def check_model_running(self) -> bool:
         """Check if any models are currently running on the inference server"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get(f"{INFERENCE_SERVER_URL}/models/running") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get('running', False)
-                    else:
-                        logger.warning(f"Unexpected status code checking model status: {response.status}")
-                        return False
+            session = self.get_session()
+            async with session.get(f"{INFERENCE_SERVER_URL}/models/running") as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get('running', False)
+                else:
+                    logger.warning(f"Unexpected status code checking model status: {response.status}")
+                    return False
         except asyncio.TimeoutError:
             logger.error("Timeout while checking model status")
             return False
         except Exception as e:
             logger.error(f"Error checking model status: {e}")
             return False
-        
+
+    async def ensure_model_running(self, model_name: str) -> Optional[bool]:
+        """Ask the inference service to start a model if needed and return
+        once it is running, in a single exchange. Returns None when the
+        endpoint is unavailable so callers can fall back to check/start/poll."""
+        try:
+            session = self.get_session()
+            async with session.post(f"{INFERENCE_SERVER_URL}/models/{model_name}/ensure_running",
+                                    timeout=aiohttp.ClientTimeout(total=120)) as response:
+                if response.status == 200:
+                    return True
+                if response.status == 404:
+                    # Older inference service without the endpoint
+                    return None
+                logger.error(f"ensure_running failed for model {model_name}: HTTP {response.status}")
+                return False
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout ensuring model {model_name} is running")
+            return False
+        except Exception as e:
+            logger.error(f"Error ensuring model {model_name} is running: {e}")
+            return None
+
     async def start_model(self, model_name: str) -> bool:
         """Start a specific model on the inference server"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
-                async with session.post(f"{INFERENCE_SERVER_URL}/models/{model_name}/start") as response:
-                    if response.status == 200:
-                        logger.info(f"Model {model_name} started successfully")
-                        return True
-                    else:
-                        logger.error(f"Failed to start model {model_name}: HTTP {response.status}")
-                        return False
+            session = self.get_session()
+            async with session.post(f"{INFERENCE_SERVER_URL}/models/{model_name}/start",
+                                    timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 200:
+                    logger.info(f"Model {model_name} started successfully")
+                    return True
+                else:
+                    logger.error(f"Failed to start model {model_name}: HTTP {response.status}")
+                    return False
         except asyncio.TimeoutError:
             logger.error(f"Timeout while starting model {model_name}")
             return False
         except Exception as e:
             logger.error(f"Error starting model {model_name}: {e}")
             return False
-            
+
     async def wait_for_model_ready(self, model_name: str, timeout: int = 60) -> bool:
-        """Wait for a model to become ready"""
-        start_time = asyncio.get_event_loop().time()
-        while asyncio.get_event_loop().time() - start_time < timeout:
-            try:
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+        """Wait for a model to become ready.
+
+        Event-driven: the inference side can POST /internal/ready/{model}
+        the moment the model is up and the waiter resumes instantly. A slow
+        poll of /models/running remains as a safety net for deployments
+        without the callback.
+        """
+        event = self._ready_events.setdefault(model_name, asyncio.Event())
+        session = self.get_session()
+        # get_running_loop skips get_event_loop's policy lookup and
+        # deprecation checks; we're always inside the loop here
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                # Block on the callback; fall through to one poll per interval
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(READY_POLL_INTERVAL, remaining))
+                    logger.info(f"Model {model_name} is now running")
+                    return True
+                except asyncio.TimeoutError:
+                    pass
+
+                try:
                     async with session.get(f"{INFERENCE_SERVER_URL}/models/running") as response:
                         if response.status == 200:
                             data = await response.json()
@@ -85,17 +212,85 @@ class ModelStarter:
                                 return True
                         else:
                             logger.warning(f"Unexpected status code checking model status: {response.status}")
-            except asyncio.TimeoutError:
-                logger.debug(f"Timeout checking model status for {model_name}")
-            except Exception as e:
-                logger.debug(f"Error checking model status during wait: {e}")
-            
-            # Wait a bit before checking again
-            await asyncio.sleep(2)
-            
-        logger.error(f"Timeout waiting for model {model_name} to start")
-        return False
+                except asyncio.TimeoutError:
+                    logger.debug(f"Timeout checking model status for {model_name}")
+                except Exception as e:
+                    logger.debug(f"Error checking model status during wait: {e}")
+
+            logger.error(f"Timeout waiting for model {model_name} to start")
+            return False
+        finally:
+            self._ready_events.pop(model_name, None)
         
+    async def get_model_port(self, model_name: str) -> Optional[str]:
+        """Look up a model's serving port from the inference service"""
+        try:
+            session = self.get_session()
+            async with session.get(f"{INFERENCE_SERVER_URL}/models") as response:
+                if response.status != 200:
+                    return None
+                data = await response.json()
+                for model in data.get('models', []):
+                    if model.get('model_name') == model_name and model.get('port'):
+                        return model['port']
+        except Exception as e:
+            logger.debug(f"Error looking up port for model {model_name}: {e}")
+        return None
+
+    async def proxy_request(self, request: web.Request, path: str, port: str) -> web.StreamResponse:
+        """Relay the original request to the now-running model and stream its
+        response back, sparing nginx a retry round-trip.
+
+        Both directions stream: the request body is handed to aiohttp as the
+        incoming StreamReader and the upstream response is copied in 64KB
+        chunks, so large payloads (images, long completions) are never
+        materialized in this process.
+        """
+        url = f"http://{INFERENCE_SERVER_HOST}:{port}/{path}"
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() not in ('host', 'content-length', 'connection')}
+        body = request.content if request.body_exists else None
+
+        session = self.get_session()
+        async with session.request(request.method, url, headers=headers, data=body,
+                                   params=request.rel_url.query,
+                                   timeout=aiohttp.ClientTimeout(total=120)) as upstream:
+            response_headers = {name: value for name, value in upstream.headers.items()
+                                if name.lower() not in ('transfer-encoding', 'content-length', 'connection')}
+            response = web.StreamResponse(status=upstream.status, headers=response_headers)
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_chunked(65536):
+                await response.write(chunk)
+            await response.write_eof()
+            return response
+
+    async def _ensure_ready(self, model_name: str) -> bool:
+        """Make sure a model is running, via the ensure_running exchange or
+        the legacy check/start/poll fallback"""
+        # Prefer the single ensure_running exchange: the inference service
+        # checks, starts and waits server-side, saving two round-trips and
+        # the poll granularity
+        ensured = await self.ensure_model_running(model_name)
+        if ensured is not None:
+            return ensured
+
+        # Fall back to the legacy sequence
+        if await self.check_model_running():
+            return True
+
+        logger.info(f"Model {model_name} not running, starting it now...")
+        # Arm the readiness event before starting so a callback that fires
+        # during start_model isn't lost
+        self._ready_events.setdefault(model_name, asyncio.Event())
+        if not await self.start_model(model_name):
+            logger.error(f"Failed to start model {model_name}")
+            return False
+
+        ready = await self.wait_for_model_ready(model_name)
+        if not ready:
+            logger.error(f"Model {model_name} failed to become ready")
+        return ready
+
     async def handle_model_request(self, request: web.Request) -> web.Response:
         """Handle incoming requests to model endpoints"""
         model_name = request.match_info.get('model_name', '')
@@ -106,32 +301,50 @@ class ModelStarter:
             return web.Response(status=400, text="Model name required")
             
         logger.info(f"Request for model: {model_name}, path: {path}")
-        
-        # Check if model is running
-        is_running = await self.check_model_running()
-        
-        if not is_running:
-            logger.info(f"Model {model_name} not running, starting it now...")
-            success = await self.start_model(model_name)
-            
-            if not success:
-                logger.error(f"Failed to start model {model_name}")
-                return web.Response(status=500, text=f"Failed to start model {model_name}")
-                
-            # Wait for model to be ready
-            ready = await self.wait_for_model_ready(model_name)
-            if not ready:
-                logger.error(f"Model {model_name} failed to become ready")
-                return web.Response(status=500, text=f"Model {model_name} failed to start")
-        
-        # Return 504 to indicate to nginx that it should retry the upstream
-        # This is because we've ensured the model is ready, but we want nginx to 
-        # retry the actual request to the real model service
+
+        # Single-flight: concurrent requests for the same cold model elect a
+        # leader to drive the start; followers wait on its outcome instead of
+        # triggering duplicate starts
+        async with self._start_lock:
+            start_event = self._starting.get(model_name)
+            leader = start_event is None
+            if leader:
+                start_event = asyncio.Event()
+                self._starting[model_name] = start_event
+
+        if leader:
+            ready = False
+            try:
+                ready = await self._ensure_ready(model_name)
+            finally:
+                start_event.ready = ready
+                self._starting.pop(model_name, None)
+                start_event.set()
+        else:
+            await start_event.wait()
+            ready = getattr(start_event, 'ready', False)
+
+        if not ready:
+            return web.Response(status=500, text=f"Failed to start model {model_name}")
+
+        # Proxy the original request straight through to the model now that
+        # it is ready, saving nginx a retry round-trip; when the port can't
+        # be resolved, fall back to the 504 that tells nginx to retry the
+        # real upstream itself
+        port = await self.get_model_port(model_name)
+        if port is not None:
+            try:
+                return await self.proxy_request(request, path, port)
+            except Exception as e:
+                logger.error(f"Error proxying request for model {model_name}: {e}")
+
         logger.info(f"Model {model_name} is ready, returning 504 to trigger nginx retry")
         return web.Response(status=504, text="Service Unavailable - Model ready, retry upstream")
 
     def run(self, host='0.0.0.0', port=8080):
         """Run the starter server"""
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
         web.run_app(self.app, host=host, port=port)
 
 if __name__ == '__main__':
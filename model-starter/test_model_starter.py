@@ -2,12 +2,8 @@
 import asyncio
 import unittest
 from unittest.mock import AsyncMock, patch
-import sys
-import os
-
-# Add the project root to the path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# sys.path is prepared once in conftest.py
 from model_starter import ModelStarter
 
 class TestModelStarter(unittest.TestCase):
@@ -1,19 +1,71 @@
 #!/usr/bin/env python3
 
-import json
+import functools
+import hashlib
 import os
 import time
+import orjson
 import requests
 import yaml
-from kubernetes import client, config
+from kubernetes import client, config, watch
 from kubernetes.client.rest import ApiException
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Templates for the per-model pieces of the rendered nginx.conf; formatted
+# once per model instead of rebuilding the literals in the loop body.
+# JSON response for OpenAI-compatible /v1/models endpoint
+MODELS_JSON_TEMPLATE = '{{"models":[{{"name":"{model_name}","model":"{model_name}","modified_at":"","size":"","digest":"","type":"model","description":"","tags":[""],"capabilities":["completion"],"parameters":"","details":{{"parent_model":"","format":"gguf","family":"","families":[""],"parameter_size":"","quantization_level":""}}}}],"object":"list","data":[{{"id":"{model_name}","object":"model","created":1766686673,"owned_by":"llamacpp","meta":{{}}}}]}}'
+
+LOCATION_BLOCK_TEMPLATE = """
+            location /{model_name}/ {{
+                proxy_pass http://{hostname}:{port}/;
+                proxy_set_header Host $host;
+                proxy_set_header X-Real-IP $remote_addr;
+                proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+                proxy_set_header X-Forwarded-Proto $scheme;
+                proxy_next_upstream error timeout invalid_header http_500 http_502 http_503;
+                proxy_next_upstream_tries 1;
+                error_page 502 = @retry;
+            }}
+            location /{model_name}/v1/models {{
+                default_type application/json;
+                return 200 '{models_json}';
+            }}"""
+
+@functools.lru_cache(maxsize=256)
+def _location_block(model_name, port, hostname):
+    """Format the location block for one model; memoized so steady-state
+    reconciles with unchanged topology reuse the cached string"""
+    return LOCATION_BLOCK_TEMPLATE.format(
+        model_name=model_name,
+        hostname=hostname,
+        port=port,
+        models_json=MODELS_JSON_TEMPLATE.format(model_name=model_name))
+
+# Per-model entry in the Open WebUI OPENAI_API_CONFIGS payload (simplified
+# structure); copied shallowly per model
+WEBUI_MODEL_CONFIG = {
+    "enable": True,
+    "tags": [],
+    "prefix_id": "",
+    "model_ids": []
+}
+
+# Shared retry location appended after the per-model blocks; constant, so
+# built once at import instead of per reconcile
+RETRY_LOCATION_BLOCK = """
+    location @retry {
+        add_header Retry-After 60 always;
+        default_type application/json;
+        return 429 "{}";
+    }"""
+
 class NGINXConfigMapUpdater:
     def __init__(self):
         # Load configuration
@@ -26,7 +78,14 @@ class NGINXConfigMapUpdater:
             config.load_kube_config()  # For local development
         
         self.api_instance = client.CoreV1Api()
-        
+
+        # One keep-alive session for all inference-service / Open WebUI calls
+        # instead of a fresh TCP connection per request
+        self._http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+
         # Set up inference service URL
         self.inference_service_url = self.config.get('inference_service_url', 'http://localhost:5002')
         
@@ -37,8 +96,21 @@ class NGINXConfigMapUpdater:
         self.last_models = []
         self.last_update_time = 0
         
-        # Store the config.json content to avoid unnecessary updates
-        self.last_config_json = []
+        # Local copy of the ConfigMap kept fresh by the watch thread
+        self._cached_cm = None
+        self._cm_lock = threading.Lock()
+
+        # Set by the watch thread when the ConfigMap changes out from under us
+        self._dirty = threading.Event()
+
+        # Hashes of the last rendered/sent payloads, to skip byte-identical
+        # ConfigMap patches and Open WebUI posts
+        self._last_content_hash = None
+        self._last_webui_hash = None
+
+        # The ConfigMap patch and the Open WebUI post are independent I/O;
+        # run them side by side instead of back to back
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
         
     def load_config(self):
         """Load configuration from environment or default values"""
@@ -50,14 +122,20 @@ class NGINXConfigMapUpdater:
             'check_interval': int(os.environ.get('CHECK_INTERVAL', '30')),
             'max_retries': int(os.environ.get('MAX_RETRIES', '3')),
             'retry_delay': int(os.environ.get('RETRY_DELAY', '5')),
-            'health_check_interval': int(os.environ.get('HEALTH_CHECK_INTERVAL', '60'))
+            'debounce_seconds': float(os.environ.get('DEBOUNCE_SECONDS', '0.25')),
+            'health_check_interval': int(os.environ.get('HEALTH_CHECK_INTERVAL', '60')),
+            # Snapshot hot-path values once instead of hitting os.environ on
+            # every render/send
+            'proxy_hostname': os.environ.get('PROXY_HOSTNAME', 'localhost'),
+            'nginx_router_hostname': os.environ.get('NGINX_ROUTER_HOSTNAME', 'nginx-service.inference-manager'),
+            'open_webui_api_key_file': os.environ.get('OPEN_WEBUI_API_KEY_FILE')
         }
     
     def get_available_models(self):
         """Fetch available models from inference service with retry logic"""
         for attempt in range(self.config['max_retries']):
             try:
-                response = requests.get(
+                response = self._http.get(
                     f"{self.inference_service_url}/models",
                     timeout=10
                 )
@@ -77,46 +155,24 @@ class NGINXConfigMapUpdater:
         logger.error("Failed to fetch models after all retries")
         return []
     
-    def create_nginx_location_block(self, model_name, port):
+    def create_nginx_location_block(self, model_name, port, hostname=None):
         """Create NGINX location block for a model"""
-        # Get hostname from environment variable or default to localhost
-        hostname = os.environ.get('PROXY_HOSTNAME', 'localhost')
-        # JSON response for OpenAI-compatible /v1/models endpoint
-        models_json = f'{{"models":[{{"name":"{model_name}","model":"{model_name}","modified_at":"","size":"","digest":"","type":"model","description":"","tags":[""],"capabilities":["completion"],"parameters":"","details":{{"parent_model":"","format":"gguf","family":"","families":[""],"parameter_size":"","quantization_level":""}}}}],"object":"list","data":[{{"id":"{model_name}","object":"model","created":1766686673,"owned_by":"llamacpp","meta":{{}}}}]}}'
-        return f"""
-            location /{model_name}/ {{
-                proxy_pass http://{hostname}:{port}/;
-                proxy_set_header Host $host;
-                proxy_set_header X-Real-IP $remote_addr;
-                proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
-                proxy_set_header X-Forwarded-Proto $scheme;
-                proxy_next_upstream error timeout invalid_header http_500 http_502 http_503;
-                proxy_next_upstream_tries 1;
-                error_page 502 = @retry;
-            }}
-            location /{model_name}/v1/models {{
-                default_type application/json;
-                return 200 '{models_json}';
-            }}"""
-    
+        if hostname is None:
+            hostname = self.config['proxy_hostname']
+        return _location_block(model_name, port, hostname)
+
     def generate_nginx_config(self, models):
         """Generate complete NGINX configuration with location blocks for all models"""
-        location_blocks = []
-        for model in models:
-            model_name = model.get('model_name')
-            port = model.get('port')
-            if model_name and port:
-                location_blocks.append(self.create_nginx_location_block(model_name, port))
-        
+        hostname = self.config['proxy_hostname']
+        location_blocks = [
+            self.create_nginx_location_block(model['model_name'], model['port'], hostname)
+            for model in models
+            if model.get('model_name') and model.get('port')
+        ]
+
         # Add shared retry location block at the end
-        retry_block = """
-    location @retry {
-        add_header Retry-After 60 always;
-        default_type application/json;
-        return 429 "{}";
-    }"""
-        location_blocks.append(retry_block)
-        
+        location_blocks.append(RETRY_LOCATION_BLOCK)
+
         return '\n'.join(location_blocks)
     
     def generate_config_json_entries(self, models):
@@ -134,19 +190,7 @@ class NGINXConfigMapUpdater:
                 "endpoint_429": f"{self.inference_service_url}/models/{model_name}/start"
             })
         return config_entries
-    
-    def should_update_config_json(self, models):
-        """Check if we should update the config.json content based on model changes"""
-        # Generate current config entries
-        current_config = self.generate_config_json_entries(models)
-        
-        # If no previous config or different from previous, update needed
-        if not self.last_config_json:
-            return True
-        
-        # Compare the config entries
-        return current_config != self.last_config_json
-    
+
     def update_configmap(self, models):
         """Update the NGINX ConfigMap with new configuration"""
         try:
@@ -155,29 +199,58 @@ class NGINXConfigMapUpdater:
             
             # Generate new config.json entries
             config_entries = self.generate_config_json_entries(models)
-            
-            # Read existing configmap
-            configmap = self.api_instance.read_namespaced_config_map(
-                name=self.config['configmap_name'],
-                namespace=self.config['configmap_namespace']
-            )
-            
-            # Update the nginx.conf content
-            configmap.data['nginx.conf'] = new_nginx_conf
-            
-            # Update the config.json content
-            configmap.data['config.json'] = json.dumps(config_entries, indent=4)
-            
-            # Update the configmap
+            # Compact orjson output: the value is parsed by the router, not
+            # read by humans, so skip pretty-printing and its extra bytes
+            config_json = orjson.dumps(config_entries).decode()
+
+            # Skip the patch (and the nginx reload it triggers) only when the
+            # ConfigMap itself already holds the rendered content. The watch
+            # cache is the source of truth here: comparing against it means
+            # an external edit that clobbers our keys is repaired instead of
+            # skipped. The in-memory fingerprint only gates before the watch
+            # has delivered a copy.
+            content_hash = hashlib.sha256(
+                new_nginx_conf.encode() + config_json.encode()).hexdigest()
+            with self._cm_lock:
+                cached_cm = self._cached_cm
+            if cached_cm is not None:
+                live_data = cached_cm.data or {}
+                if (live_data.get('nginx.conf') == new_nginx_conf
+                        and live_data.get('config.json') == config_json):
+                    logger.info("ConfigMap already matches rendered config, skipping patch")
+                    self._last_content_hash = content_hash
+                    return True
+            elif content_hash == self._last_content_hash:
+                logger.info("Rendered config unchanged, skipping ConfigMap patch")
+                return True
+
+            # Server-side apply: send only the two data keys we own and let
+            # the API server merge them. One round-trip, no read-modify-write
+            # race with other writers of this ConfigMap.
+            body = {
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {
+                    "name": self.config['configmap_name'],
+                    "annotations": {"nginx-updater/content-hash": content_hash}
+                },
+                "data": {
+                    "nginx.conf": new_nginx_conf,
+                    "config.json": config_json
+                }
+            }
             api_response = self.api_instance.patch_namespaced_config_map(
                 name=self.config['configmap_name'],
                 namespace=self.config['configmap_namespace'],
-                body=configmap
+                body=body,
+                field_manager="nginx-configmap-updater",
+                force=True,
+                _content_type="application/apply-patch+yaml"
             )
             
             logger.info("Successfully updated NGINX ConfigMap")
-            # Store the current config entries for future comparison
-            self.last_config_json = config_entries
+            # Store a fingerprint of what was applied for future comparison
+            self._last_content_hash = content_hash
             return True
             
         except ApiException as e:
@@ -195,35 +268,29 @@ class NGINXConfigMapUpdater:
             
         try:
             # Prepare the OpenAI API configuration for Open WebUI
-            hostname = os.environ.get('NGINX_ROUTER_HOSTNAME', 'nginx-service.inference-manager')
-            
-            # Create base URLs for each model
-            base_urls = []
-            api_keys = []
-            configs = {}
-            
-            for i, model in enumerate(models):
-                model_name = model.get('model_name')
-                port = model.get('port')
-                if model_name and port:
-                    # Create the base URL for this model's OpenAI API endpoint
-                    base_url = f"http://{hostname}/{model_name}/v1"
-                    base_urls.append(base_url)
-                    api_keys.append("*")
-                    
-                    # Create config for this model (simplified structure)
-                    configs[str(i)] = {
-                        "enable": True,
-                        "tags": [],
-                        "prefix_id": "",
-                        "model_ids": []
-                    }
-            
+            hostname = self.config['nginx_router_hostname']
+
+            # One pass: base URL per model's OpenAI API endpoint, with keys
+            # and per-model configs derived from its length
+            base_urls = [
+                f"http://{hostname}/{model['model_name']}/v1"
+                for model in models
+                if model.get('model_name') and model.get('port')
+            ]
+            api_keys = ["*"] * len(base_urls)
+            configs = {str(i): {**WEBUI_MODEL_CONFIG} for i in range(len(base_urls))}
+
+            # Skip the POST entirely when nothing Open WebUI sees has changed
+            payload_hash = hash(tuple(base_urls))
+            if payload_hash == self._last_webui_hash:
+                logger.info("Open WebUI configuration unchanged, skipping send")
+                return True
+
             # Send to Open WebUI API with the required structure
             headers = {'Content-Type': 'application/json'}
             
             # Read API key from file if specified by environment variable
-            api_key_file = os.environ.get('OPEN_WEBUI_API_KEY_FILE')
+            api_key_file = self.config['open_webui_api_key_file']
             if api_key_file:
                 try:
                     with open(api_key_file, 'r') as f:
@@ -240,7 +307,7 @@ class NGINXConfigMapUpdater:
                 "OPENAI_API_CONFIGS": configs
             }
             
-            response = requests.post(
+            response = self._http.post(
                 f"{self.open_webui_url}/openai/config/update",
                 json=payload,
                 headers=headers,
@@ -249,6 +316,7 @@ class NGINXConfigMapUpdater:
             
             if response.status_code in [200, 201]:
                 logger.info(f"Successfully sent model configurations to Open WebUI for {len(models)} models")
+                self._last_webui_hash = payload_hash
                 return True
             else:
                 logger.error(f"Failed to send model configurations to Open WebUI: {response.status_code} - {response.text}")
@@ -268,45 +336,105 @@ class NGINXConfigMapUpdater:
         if not self.last_models:
             return True
             
-        # Compare models - if different, update needed
-        current_model_names = {model.get('model_name') for model in models}
-        last_model_names = {model.get('model_name') for model in self.last_models}
-        
-        return current_model_names != last_model_names
+        # Compare models - if different, update needed; ports matter too,
+        # since a model moving port changes every rendered proxy_pass
+        current_models = {(model.get('model_name'), model.get('port')) for model in models}
+        last_models = {(model.get('model_name'), model.get('port')) for model in self.last_models}
+
+        return current_models != last_models
     
+    def _watch_configmap(self):
+        """Keep a local copy of the target ConfigMap fresh via the watch API.
+
+        Watching by name (field selector) means the API server pushes changes
+        to us instead of us re-reading the ConfigMap on every cycle. External
+        edits mark the service dirty so the main loop reconciles right away.
+        """
+        while True:
+            try:
+                w = watch.Watch()
+                for event in w.stream(
+                        self.api_instance.list_namespaced_config_map,
+                        namespace=self.config['configmap_namespace'],
+                        field_selector=f"metadata.name={self.config['configmap_name']}",
+                        timeout_seconds=0):
+                    with self._cm_lock:
+                        self._cached_cm = event['object'] if event['type'] != 'DELETED' else None
+                    if event['type'] == 'MODIFIED':
+                        self._dirty.set()
+            except ApiException as e:
+                if e.status == 410:
+                    # Our resource version expired; just restart from the latest
+                    logger.info("ConfigMap watch expired, restarting")
+                else:
+                    logger.warning(f"ConfigMap watch failed: {e}")
+                    time.sleep(self.config['retry_delay'])
+            except Exception as e:
+                logger.warning(f"ConfigMap watch error: {e}")
+                time.sleep(self.config['retry_delay'])
+
+    def reconcile(self, force=False):
+        """Fetch the current model list and push it out if anything changed
+
+        Args:
+            force: Skip the model-set gate, e.g. after a watch event showed
+                the ConfigMap was edited externally; the content comparison
+                in update_configmap still avoids a redundant patch
+        """
+        # Get available models from inference service
+        models = self.get_available_models()
+        logger.info(f"Found {len(models)} models")
+
+        # Update ConfigMap and Open WebUI with new configuration if needed
+        if models and (force or self.should_update_config(models)):
+            # Independent downstreams: overlap the network waits
+            cm_future = self._io_pool.submit(self.update_configmap, models)
+            webui_future = self._io_pool.submit(self.send_models_to_open_webui, models)
+            success = cm_future.result()
+            webui_success = webui_future.result()
+            if success:
+                logger.info("ConfigMap updated successfully")
+            else:
+                logger.error("Failed to update ConfigMap")
+            if webui_success:
+                logger.info("Models successfully sent to Open WebUI")
+            else:
+                logger.error("Failed to send models to Open WebUI")
+            # Only remember the model set when both downstreams took it, so
+            # the next cycle retries whichever one failed
+            if success and webui_success:
+                self.last_models = models
+                self.last_update_time = time.time()
+        elif not models:
+            logger.info("No models found")
+        else:
+            logger.info("No changes in models, skipping ConfigMap update")
+
     def run(self):
         """Main loop to continuously monitor and update"""
         logger.info("Starting NGINX ConfigMap Updater service")
-        
+
+        # The inference service has no watch/push channel, so model changes
+        # are still discovered by polling it; the ConfigMap itself is watched
+        # so we never have to GET it and can react to external edits at once.
+        threading.Thread(target=self._watch_configmap, daemon=True).start()
+
+        force = False
         while True:
             try:
-                # Get available models from inference service
-                models = self.get_available_models()
-                logger.info(f"Found {len(models)} models")
-                
-                # Update ConfigMap with new configuration if needed
-                if models and self.should_update_config(models):
-                    success = self.update_configmap(models)
-                    if success:
-                        logger.info("ConfigMap updated successfully")
-                        # Also send models to Open WebUI
-                        webui_success = self.send_models_to_open_webui(models)
-                        if webui_success:
-                            logger.info("Models successfully sent to Open WebUI")
-                        else:
-                            logger.error("Failed to send models to Open WebUI")
-                        self.last_models = models
-                        self.last_update_time = time.time()
-                    else:
-                        logger.error("Failed to update ConfigMap")
-                elif not models:
-                    logger.info("No models found")
-                else:
-                    logger.info("No changes in models, skipping ConfigMap update")
-                
-                # Wait for next check
-                time.sleep(self.config['check_interval'])
-                
+                self.reconcile(force=force)
+                force = False
+
+                # Wait for next check; a watch event cuts the wait short and
+                # forces the next reconcile past the model-set gate so
+                # external edits to the ConfigMap get re-asserted
+                if self._dirty.wait(timeout=self.config['check_interval']):
+                    # Debounce: let a burst of rapid-fire events settle so K
+                    # changes coalesce into a single reconcile
+                    time.sleep(self.config['debounce_seconds'])
+                    self._dirty.clear()
+                    force = True
+
             except KeyboardInterrupt:
                 logger.info("Service stopped by user")
                 break
@@ -22,7 +22,7 @@ class TestNGINXConfigMapUpdater(unittest.TestCase):
             with patch('nginx_configmap_updater.config.load_kube_config'):
                 self.updater = NGINXConfigMapUpdater()
     
-    @patch('nginx_configmap_updater.requests.get')
+    @patch('nginx_configmap_updater.requests.Session.get')
     def test_get_available_models_success(self, mock_get):
         """Test successful model fetching"""
         mock_response = Mock()
@@ -40,7 +40,7 @@ class TestNGINXConfigMapUpdater(unittest.TestCase):
         self.assertEqual(models[0]['model_name'], 'test_model_1')
         self.assertEqual(models[0]['port'], '8080')
     
-    @patch('nginx_configmap_updater.requests.get')
+    @patch('nginx_configmap_updater.requests.Session.get')
     def test_get_available_models_failure(self, mock_get):
         """Test model fetching failure"""
         mock_response = Mock()